@@ -1,13 +1,8 @@
 import io
+import os
 import pandas as pd
 import numpy as np
 import streamlit as st
-import plotly.express as px
-from scipy import stats
-import statsmodels.api as sm
-from statsmodels.formula.api import ols
-from statsmodels.stats.anova import anova_lm
-from statsmodels.stats.multitest import multipletests
 
 # ==========================================
 # 1. KONFIGURASI TEMA & WARNA (PALETTE)
@@ -25,45 +20,10 @@ QUAL_ORDER = ["Premium", "Medium", "Pecah"]
 QUAL_COLORS = {"Premium": "#76944C", "Medium": "#FFD21F", "Pecah": "#C0B6AC"}
 MONTHS_ID = ["Januari","Februari","Maret","April","Mei","Juni","Juli","Agustus","September","Oktober","November","Desember"]
 MONTH_CAT = pd.CategoricalDtype(categories=MONTHS_ID, ordered=True)
+QUAL_CAT = pd.CategoricalDtype(categories=QUAL_ORDER)
 
-# ==========================================
-# 2. FUNGSI PEMROSESAN DATA
-# ==========================================
-def parse_harga_beras(source):
-    # Mendukung input berupa path string atau file-like object
-    raw = pd.read_csv(source, header=None)
-    idx_bulan = raw.apply(lambda r: r.astype(str).str.contains(r"\bJanuari\b", case=False, na=False).any(), axis=1).idxmax()
-    
-    month_map = {j: str(raw.iloc[idx_bulan, j]).strip() for j in range(1, raw.shape[1]) 
-                 if str(raw.iloc[idx_bulan, j]).strip() in MONTHS_ID}
-
-    tahun = 2024
-    tahun_search = raw.iloc[max(0, idx_bulan-3):idx_bulan+1, :].astype(str)
-    for val in tahun_search.values.flatten():
-        if val.isdigit() and len(val) == 4:
-            tahun = int(val)
-            break
-
-    records = []
-    for i in range(idx_bulan+1, raw.shape[0]):
-        qual = str(raw.iloc[i, 0]).strip().title()
-        if qual not in QUAL_ORDER: continue
-        for col_idx, month in month_map.items():
-            val = str(raw.iloc[i, col_idx]).strip().replace(",", "")
-            try:
-                records.append({"kualitas": qual, "bulan": month, "harga": float(val)})
-            except: continue
-
-    df = pd.DataFrame(records)
-    df["bulan"] = df["bulan"].astype(MONTH_CAT)
-    return df.sort_values(["bulan", "kualitas"]).reset_index(drop=True), tahun
-
-# ==========================================
-# 3. STREAMLIT UI (FULL TIMES NEW ROMAN)
-# ==========================================
-st.set_page_config(page_title="Analisis Harga Beras RCBD", layout="wide")
-
-st.markdown(f"""
+# Blok HTML/CSS statis dirakit sekali saat import, bukan di setiap rerun Streamlit
+STYLE_HTML = f"""
 <style>
     /* Mengatur Font Times New Roman Secara Global */
     html, body, [class*="st-"], .stMarkdown, .stTable, .stDataFrame, 
@@ -94,117 +54,279 @@ st.markdown(f"""
         box-shadow: 0 4px 12px rgba(0,0,0,0.1) !important;
     }}
 
+    .section-title {{ color: {CHART_PALETTE['moss_green']}; }}
+
     .stTabs [aria-selected="true"] {{
         background-color: {CHART_PALETTE['moss_green']} !important; color: white !important;
     }}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+HEADER_HTML = """
+<div class="header-box">
+    <h1 style="margin:0; font-size: 3.2rem; color: white;">Laporan Analisis Harga Beras</h1>
+    <p style="font-size: 1.3rem; font-style: italic; opacity: 0.9; color: white;">Sistem Otomasi Data - Randomized Complete Block Design (RCBD)</p>
+</div>
+"""
 
-st.markdown(f"""
-    <div class="header-box">
-        <h1 style="margin:0; font-size: 3.2rem; color: white;">Laporan Analisis Harga Beras</h1>
-        <p style="font-size: 1.3rem; font-style: italic; opacity: 0.9; color: white;">Sistem Otomasi Data - Randomized Complete Block Design (RCBD)</p>
-    </div>
-""", unsafe_allow_html=True)
+# Style + header dikirim sebagai satu elemen markdown
+PAGE_HTML = STYLE_HTML + HEADER_HTML
 
 # ==========================================
-# 4. LOGIKA AUTO-LOAD DATA
+# 2. FUNGSI PEMROSESAN DATA
+# ==========================================
+def _read_raw_csv(file_bytes):
+    # Semua sel dibaca sebagai teks apa adanya; pakai parser pyarrow (multithread) bila tersedia
+    opts = dict(header=None, dtype=str, keep_default_na=False)
+    try:
+        return pd.read_csv(io.BytesIO(file_bytes), engine="pyarrow", **opts)
+    except (ImportError, ValueError):
+        return pd.read_csv(io.BytesIO(file_bytes), engine="c", low_memory=False, **opts)
+
+@st.cache_data(show_spinner=False)
+def parse_harga_beras(file_bytes):
+    # Di-cache berdasarkan isi file (bytes), jadi parsing hanya jalan sekali per file unik
+    raw = _read_raw_csv(file_bytes)
+    # Cari baris header bulan dengan satu sapuan NumPy atas seluruh sel
+    cells = np.char.strip(raw.to_numpy(dtype=str))
+    hits = np.argwhere(np.char.lower(cells) == "januari")
+    if not hits.size:
+        raise ValueError("Baris header bulan ('Januari') tidak ditemukan pada file CSV.")
+    idx_bulan = int(hits[0, 0])
+    
+    # Kolom bulan pada baris header (kolom 0 berisi label kualitas); nama bulan
+    # dinormalisasi ke Title case agar tidak peka huruf besar/kecil seperti pencarian "januari"
+    header = np.char.title(cells[idx_bulan])
+    month_cols = np.flatnonzero(np.isin(header, MONTHS_ID))
+    month_cols = month_cols[month_cols > 0]
+    if not month_cols.size:
+        raise ValueError("Tidak ada kolom bulan (Januari–Desember) yang dikenali pada baris header.")
+
+    # Tahun = sel 4 digit pertama di sekitar header (default 2024)
+    head = cells[max(0, idx_bulan-3):idx_bulan+1]
+    years = head[(np.char.str_len(head) == 4) & np.char.isdigit(head)]
+    tahun = int(years[0]) if years.size else 2024
+
+    # Blok data diambil sebagai array 2-D lalu dikonversi ke angka sekaligus
+    body = cells[idx_bulan+1:]
+    quals = np.char.title(body[:, 0])
+    rows = np.isin(quals, QUAL_ORDER)
+    if not rows.any():
+        raise ValueError(f"Tidak ada baris kualitas ({', '.join(QUAL_ORDER)}) di bawah header bulan; periksa label di kolom pertama.")
+    block = np.char.replace(body[rows][:, month_cols], ",", "")
+    harga = pd.to_numeric(pd.Series(block.ravel()), errors="coerce").to_numpy()
+
+    df = pd.DataFrame({
+        "kualitas": np.repeat(quals[rows], month_cols.size),
+        "bulan": np.tile(header[month_cols], rows.sum()),
+        "harga": harga,
+    }).dropna(subset=["harga"])
+    if df.empty:
+        raise ValueError("Tidak ada nilai harga numerik pada baris kualitas.")
+    # Domain kualitas & bulan tetap: simpan sebagai kode kategori, bukan string Python
+    df["kualitas"] = df["kualitas"].astype(QUAL_CAT)
+    df["bulan"] = df["bulan"].astype(MONTH_CAT)
+    return df.sort_values(["bulan", "kualitas"]).reset_index(drop=True), tahun
+
+@st.cache_data(show_spinner=False)
+def make_wide(df_long):
+    # Data BPS unik per (bulan, kualitas): cukup unstack, groupby-mean hanya jika ada duplikat
+    s = df_long.set_index(["bulan", "kualitas"])["harga"]
+    if not s.index.is_unique:
+        s = s.groupby(level=["bulan", "kualitas"], observed=True).mean()
+    return s.unstack("kualitas").reindex(columns=QUAL_ORDER)
+
 # ==========================================
-data_source = None
+# 3. FUNGSI STATISTIK (RCBD)
+# ==========================================
+POSTHOC_PAIRS = [("Pecah", "Medium"), ("Premium", "Medium"), ("Premium", "Pecah")]
+
+def holm_adjust(pvals, alpha=0.05):
+    # Koreksi Holm step-down; mengembalikan (reject, p_adj) seperti multipletests
+    p = np.asarray(pvals, dtype=np.float64)
+    m = p.size
+    order = np.argsort(p)
+    adj_sorted = np.minimum(np.maximum.accumulate((m - np.arange(m)) * p[order]), 1.0)
+    p_adj = np.empty_like(adj_sorted)
+    p_adj[order] = adj_sorted
+    return p_adj <= alpha, p_adj
+
+@st.cache_resource(show_spinner=False)
+def rcbd_analysis(wide):
+    # ANOVA RCBD bentuk tertutup + post-hoc dari satu matriks blok lengkap:
+    # kualitas = perlakuan, bulan = blok. Rerata & MSE dipakai bersama oleh kedua tabel.
+    # Hasil di-cache sebagai objek (cache_resource) dan hanya dibaca oleh UI.
+    # scipy.stats diimpor di sini (bukan di atas) agar header & sidebar tampil sebelum impor yang berat
+    from scipy import stats
+
+    # Tolak data yang tidak bisa dianalisis, jangan sampai menghasilkan tabel NaN
+    missing = [q for q in QUAL_ORDER if q not in wide.columns or not wide[q].notna().any()]
+    if missing:
+        raise ValueError(f"Tidak ada data harga untuk kualitas: {', '.join(missing)}.")
+    Y = wide.dropna().to_numpy(dtype=np.float64)
+    b, t = Y.shape
+    n_dropped = len(wide) - b
+    if b < 2:
+        raise ValueError(f"ANOVA RCBD butuh minimal 2 bulan dengan data lengkap untuk semua kualitas (ditemukan {b}).")
+    grand = Y.mean()
+    trt_means = Y.mean(axis=0)
+    ss_trt = b * ((trt_means - grand) ** 2).sum()
+    ss_blk = t * ((Y.mean(axis=1) - grand) ** 2).sum()
+    ss_res = ((Y - grand) ** 2).sum() - ss_trt - ss_blk
+    df_trt, df_blk = t - 1, b - 1
+    df_res = df_trt * df_blk
+    ms_res = ss_res / df_res
+    f_trt, f_blk = (ss_trt / df_trt) / ms_res, (ss_blk / df_blk) / ms_res
+    aov_table = pd.DataFrame({
+        "sum_sq": [ss_trt, ss_blk, ss_res],
+        "df": [float(df_trt), float(df_blk), float(df_res)],
+        "F": [f_trt, f_blk, np.nan],
+        "PR(>F)": [stats.f.sf(f_trt, df_trt, df_res), stats.f.sf(f_blk, df_blk, df_res), np.nan],
+    }, index=["C(kualitas)", "C(bulan)", "Residual"])
+
+    # Kontras antar kualitas memakai MSE residual (setara t_test pada model OLS aditif)
+    # Semua pasangan dihitung sekaligus lewat indeks kolom, satu panggilan stats.t.sf
+    col_idx = {q: i for i, q in enumerate(wide.columns)}
+    ia = np.array([col_idx[a] for a, _ in POSTHOC_PAIRS])
+    ib = np.array([col_idx[c] for _, c in POSTHOC_PAIRS])
+    diff = trt_means[ia] - trt_means[ib]
+    t_stat = diff / np.sqrt(2 * ms_res / b)
+    p_val = 2 * stats.t.sf(np.abs(t_stat), df_res)
+
+    rej, p_adj = holm_adjust(p_val)
+    ph_table = pd.DataFrame({
+        "Perbandingan": [f"{a} vs {c}" for a, c in POSTHOC_PAIRS],
+        "Selisih": diff,
+        "t-Stat": t_stat,
+        "p-Value": p_val,
+        "p-Adj (Holm)": p_adj,
+        "Signifikan": np.where(rej, "Ya", "Tidak"),
+    })
+    return aov_table, ph_table, n_dropped
+
+# ==========================================
+# 4. FUNGSI VISUALISASI
+# ==========================================
+@st.cache_resource(show_spinner=False)
+def build_charts(df_long, mean_by_q):
+    # Figure Plotly dibangun sekali per data; objek yang sama dipakai ulang (read-only) tanpa unpickle
+    import plotly.express as px
+
+    fig_line = px.line(df_long, x="bulan", y="harga", color="kualitas", color_discrete_map=QUAL_COLORS, markers=True)
+    fig_line.update_layout(font_family="Times New Roman", font_color="#1A1A1A", plot_bgcolor='rgba(0,0,0,0)')
+
+    fig_box = px.box(df_long, x="kualitas", y="harga", color="kualitas", color_discrete_map=QUAL_COLORS)
+    fig_box.update_layout(font_family="Times New Roman")
+
+    fig_bar = px.bar(mean_by_q.reset_index(), x="kualitas", y="harga", color="kualitas", color_discrete_map=QUAL_COLORS)
+    fig_bar.update_layout(font_family="Times New Roman")
+    return fig_line, fig_box, fig_bar
+
+# ==========================================
+# 5. STREAMLIT UI (FULL TIMES NEW ROMAN)
+# ==========================================
+st.set_page_config(page_title="Analisis Harga Beras RCBD", layout="wide")
+
+st.markdown(PAGE_HTML, unsafe_allow_html=True)
+
+# ==========================================
+# 6. LOGIKA AUTO-LOAD DATA
+# ==========================================
+data_key = None
 DEFAULT_FILE = "Data_HargaBeras.csv" # Nama file yang akan dicari otomatis
 
 with st.sidebar:
     st.markdown("### 📂 Pengaturan Data")
-    # Coba cek apakah file default ada
+    # Coba cek apakah file default ada (cukup stat, isi file baru dibaca saat parsing)
     try:
-        with open(DEFAULT_FILE, "rb") as f:
-            data_source = DEFAULT_FILE
-            st.success(f"✅ Otomatis menggunakan: {DEFAULT_FILE}")
+        default_stat = os.stat(DEFAULT_FILE)
+        data_key = (DEFAULT_FILE, default_stat.st_mtime_ns, default_stat.st_size)
+        st.success(f"✅ Otomatis menggunakan: {DEFAULT_FILE}")
     except FileNotFoundError:
         st.warning(f"⚠️ {DEFAULT_FILE} tidak ditemukan.")
     
     up = st.file_uploader("Unggah File CSV Baru (Opsional)", type=["csv"])
     if up is not None:
-        data_source = io.BytesIO(up.getvalue())
+        data_key = up.file_id
         st.info("🔄 Menggunakan file yang baru diunggah.")
 
-if data_source:
-    df_long, tahun = parse_harga_beras(data_source)
-    df_wide = df_long.pivot_table(index="bulan", columns="kualitas", values="harga").reindex(columns=QUAL_ORDER)
+if data_key:
+    # Hasil parsing disimpan per sesi dengan kunci file; rerun tanpa ganti file
+    # tidak membaca ulang maupun meng-hash ulang isi file
+    if st.session_state.get("data_key") != data_key:
+        if up is not None:
+            data_source = up.getvalue()
+        else:
+            with open(DEFAULT_FILE, "rb") as f:
+                data_source = f.read()
+        try:
+            df_long, tahun = parse_harga_beras(data_source)
+        except ValueError as e:
+            st.error(f"❌ Gagal membaca data: {e}")
+            st.stop()
+        # Satu groupby untuk rerata per kualitas, dipakai metrik dan bar chart
+        mean_by_q = df_long.groupby("kualitas", observed=True)["harga"].mean()
+        st.session_state["parsed"] = (df_long, tahun, make_wide(df_long), mean_by_q)
+        st.session_state["data_key"] = data_key
+    df_long, tahun, df_wide, mean_by_q = st.session_state["parsed"]
 
     # Metrics
     m1, m2, m3, m4 = st.columns(4)
     m1.metric("Periode Analisis", f"Tahun {tahun}")
-    m2.metric("Rerata Premium", f"Rp {df_long[df_long['kualitas']=='Premium']['harga'].mean():,.0f}")
-    m3.metric("Rerata Medium", f"Rp {df_long[df_long['kualitas']=='Medium']['harga'].mean():,.0f}")
-    m4.metric("Rerata Pecah", f"Rp {df_long[df_long['kualitas']=='Pecah']['harga'].mean():,.0f}")
+    m2.metric("Rerata Premium", f"Rp {mean_by_q.get('Premium', np.nan):,.0f}")
+    m3.metric("Rerata Medium", f"Rp {mean_by_q.get('Medium', np.nan):,.0f}")
+    m4.metric("Rerata Pecah", f"Rp {mean_by_q.get('Pecah', np.nan):,.0f}")
 
     st.markdown("<br>", unsafe_allow_html=True)
     t1, t2, t3 = st.tabs(["📈 Tren & Distribusi", "📋 Matriks Data", "🔬 Statistik RCBD"])
 
     with t1:
-        st.markdown(f"### <span style='color:{CHART_PALETTE['moss_green']}'>Visualisasi Tren Harga</span>", unsafe_allow_html=True)
-        fig_line = px.line(df_long, x="bulan", y="harga", color="kualitas", color_discrete_map=QUAL_COLORS, markers=True)
-        fig_line.update_layout(font_family="Times New Roman", font_color="#1A1A1A", plot_bgcolor='rgba(0,0,0,0)')
+        st.markdown("### <span class='section-title'>Visualisasi Tren Harga</span>", unsafe_allow_html=True)
+        fig_line, fig_box, fig_bar = build_charts(df_long, mean_by_q)
         st.plotly_chart(fig_line, use_container_width=True)
         
         c1, c2 = st.columns(2)
         with c1:
-            fig_box = px.box(df_long, x="kualitas", y="harga", color="kualitas", color_discrete_map=QUAL_COLORS)
-            fig_box.update_layout(font_family="Times New Roman")
             st.plotly_chart(fig_box, use_container_width=True)
         with c2:
-            avg_df = df_long.groupby("kualitas")['harga'].mean().reset_index()
-            fig_bar = px.bar(avg_df, x="kualitas", y="harga", color="kualitas", color_discrete_map=QUAL_COLORS)
-            fig_bar.update_layout(font_family="Times New Roman")
             st.plotly_chart(fig_bar, use_container_width=True)
 
     with t2:
         st.markdown("### 📋 Matriks Harga Beras")
-        st.dataframe(df_wide.style.format("{:,.0f}").set_properties(**{'background-color': 'white', 'color': 'black'}), use_container_width=True)
+        # Format angka dikerjakan di sisi klien (tanpa Styler/HTML per sel);
+        # "localized" + step=1 menampilkan rupiah bulat dengan pemisah ribuan
+        st.dataframe(df_wide, column_config={q: st.column_config.NumberColumn(q, format="localized", step=1) for q in df_wide.columns}, use_container_width=True)
 
     with t3:
-        st.markdown(f"### <span style='color:{CHART_PALETTE['moss_green']}'>Analisis Inferensial (ANOVA RCBD)</span>", unsafe_allow_html=True)
-        model = ols('harga ~ C(kualitas) + C(bulan)', data=df_long).fit()
-        aov_table = anova_lm(model, typ=2)
-        aov_table.index = ['C(kualitas)', 'C(bulan)', 'Residual']
+        st.markdown("### <span class='section-title'>Analisis Inferensial (ANOVA RCBD)</span>", unsafe_allow_html=True)
+        try:
+            aov_table, ph_table, n_dropped = rcbd_analysis(df_wide)
+        except ValueError as e:
+            st.error(f"❌ Gagal menghitung ANOVA: {e}")
+            st.stop()
+        if n_dropped:
+            st.caption(f"⚠️ {n_dropped} bulan dengan data kualitas tidak lengkap dikeluarkan dari analisis (RCBD membutuhkan blok lengkap).")
         
         st.markdown("#### **Tabel Analisis Ragam (ANOVA)**")
         
         
 
-        st.table(aov_table.style.format({
-            "sum_sq": "{:.6e}", "df": "{:.1f}", "F": "{:.6f}", "PR(>F)": "{:.6e}"
-        }))
+        st.dataframe(aov_table, column_config={
+            "sum_sq": st.column_config.NumberColumn(format="%.6e"),
+            "df": st.column_config.NumberColumn(format="%.1f"),
+            "F": st.column_config.NumberColumn(format="%.6f"),
+            "PR(>F)": st.column_config.NumberColumn(format="%.6e"),
+        }, use_container_width=True)
 
         st.markdown("<br>", unsafe_allow_html=True)
         st.markdown("#### **Uji Lanjut: Post-Hoc Test (Holm Adjustment)**")
         
-        hypotheses = [
-            ("Pecah vs Medium", "C(kualitas)[T.Pecah] = 0"), 
-            ("Premium vs Medium", "C(kualitas)[T.Premium] = 0"),
-            ("Premium vs Pecah", "C(kualitas)[T.Premium] - C(kualitas)[T.Pecah] = 0")
-        ]
-        
-        ph_results, raw_p = [], []
-        for label, hyp in hypotheses:
-            t_test = model.t_test(hyp)
-            ph_results.append({
-                "Perbandingan": label, 
-                "Selisih": t_test.effect.item(), 
-                "t-Stat": t_test.tvalue.item(), 
-                "p-Value": t_test.pvalue.item()
-            })
-            raw_p.append(t_test.pvalue.item())
-        
-        rej, p_adj, _, _ = multipletests(raw_p, alpha=0.05, method="holm")
-        for i, res in enumerate(ph_results):
-            res["p-Adj (Holm)"] = p_adj[i]
-            res["Signifikan"] = "Ya" if rej[i] else "Tidak"
-        
-        st.table(pd.DataFrame(ph_results).style.format({
-            "Selisih": "{:.2f}", "t-Stat": "{:.3f}", "p-Value": "{:.4e}", "p-Adj (Holm)": "{:.4e}"
-        }))
+        st.dataframe(ph_table, column_config={
+            "Selisih": st.column_config.NumberColumn(format="%.2f"),
+            "t-Stat": st.column_config.NumberColumn(format="%.3f"),
+            "p-Value": st.column_config.NumberColumn(format="%.4e"),
+            "p-Adj (Holm)": st.column_config.NumberColumn(format="%.4e"),
+        }, use_container_width=True, hide_index=True)
 
         if aov_table.loc["C(kualitas)", "PR(>F)"] < 0.05:
             st.success("**Kesimpulan:** Terdapat perbedaan harga signifikan antar kualitas beras (p < 0.05).")